@@ -9,8 +9,10 @@ import matplotlib.pyplot as plt
 import squarify  # pip install squarify (algorithm for treemap)
 
 # Create a dataset:
-from parse_analyzer import analyze
-from utils import ropen_file
+from labels import parameter_labels
+from partial import PartialResult, load_analysis, save_partial
+from parse_analyzer import analyze, analyze_follow
+from utils import count_lines, parse_sentence_range, ropen_file, wopen_file
 
 plt.rcParams.update({'font.size': 9})  # change font size
 
@@ -35,16 +37,31 @@ def plot_heatmap(labels, values):
 
 def evaluate(args):
     if args.load:
-        with open(args.load, 'rb') as f:
-            total_eval = pickle.load(f)
+        total_eval = load_analysis(args.load)
     elif args.gold and args.eval:
+        if args.follow and args.shard:
+            sys.exit('--shard can not be combined with --follow')
+        sentence_range = parse_sentence_range(args.shard, args.gold, args.balanced_shards) if args.shard else None
+        labels = parameter_labels(args.params)
         gold_file, eval_file = ropen_file(args.gold), ropen_file(args.eval)
-        total_eval = analyze(
-            gold_file,
-            eval_file, layered=False)
+        if args.follow:
+            total_eval = analyze_follow(
+                gold_file,
+                eval_file, layered=False, interval=args.interval, labels=labels)
+        else:
+            records_file = wopen_file(args.records) if args.records else None
+            total_eval = analyze(
+                gold_file,
+                eval_file, layered=False, sentence_range=sentence_range, labels=labels, records_file=records_file)
+            if records_file:
+                records_file.close()
         gold_file.close()
         eval_file.close()
-        if args.save:
+        if args.save and sentence_range:
+            # a range past the end of the gold file ends at its last line, like in evalp.py
+            last_sentence = min(sentence_range[1], count_lines(args.gold))
+            save_partial(PartialResult(sentence_range[0], last_sentence, analysis=total_eval), args.save)
+        elif args.save:
             with open(args.save, 'wb') as f:
                 pickle.dump(total_eval, f, pickle.HIGHEST_PROTOCOL)
     else:
@@ -102,6 +119,17 @@ def parse_arguments():
     group.add_argument('--save', '-s', help="Save precomputed parse analysis to a file")
     group.add_argument('--load', '-l', help="Load precomputed parse analysis from a file")
     group.add_argument('--tags', '-t', help="Tags to analyze")
+    group.add_argument('--records', '-r', help="Write the errors of every sentence to a file instead of stdout "
+                                               "(input of diff.py)")
+    group.add_argument('--params', '-p', help="EVALB-style parameter file with label rules, see labels.py")
+    group.add_argument('--shard', help="Analyze only a part of the corpus: i/N or a line range first:last; "
+                                       "with --save a partial result for merge.py is written")
+    group.add_argument('--balanced-shards', action='store_true',
+                       help="Split i/N shards into parts of equal size in bytes instead of equal number of lines")
+    group.add_argument('--follow', '-f', action='store_true',
+                       help="Follow the eval file while the parser is writing it (stop with Ctrl+C)")
+    group.add_argument('--interval', type=float, default=10.0,
+                       help="Seconds between summaries in follow mode (default: 10)")
     arguments, unknown_args = parser.parse_known_args()
     return arguments
 
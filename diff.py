@@ -0,0 +1,134 @@
+import argparse
+import heapq
+from collections import Counter
+from itertools import groupby
+
+from parse_analyzer import SENTENCE_STATUSES, read_records
+from utils import ropen_file
+
+ANALYZED = SENTENCE_STATUSES[0]
+MISSING = 'MISSING'
+
+
+def sentence_errors(records):
+    # (sentence id, status, Counter of (category, label, span)) per sentence of records sorted by sentence id;
+    # the status is None for sentences without a status record (output of parse_analyzer.py on stdout)
+    previous_id = 0
+    for sentence_id, sentence_records in groupby(records, key=lambda record: record[0]):
+        if sentence_id <= previous_id:
+            raise ValueError(f"Error records are not sorted by sentence id: {sentence_id} after {previous_id}")
+        previous_id = sentence_id
+        status = None
+        errors = Counter()
+        for _, category, span, label in sentence_records:
+            if category in SENTENCE_STATUSES:
+                status = category
+            else:
+                errors[(category, label, span)] += 1
+        yield sentence_id, status, errors
+
+
+def align_sentences(old_sentences, new_sentences):
+    # merge join of two sorted streams: (sentence id, (status, errors) or None if the sentence is missing in a stream)
+    old, new = next(old_sentences, None), next(new_sentences, None)
+    while old or new:
+        if new is None or (old and old[0] < new[0]):
+            yield old[0], old[1:], None
+            old = next(old_sentences, None)
+        elif old is None or new[0] < old[0]:
+            yield new[0], None, new[1:]
+            new = next(new_sentences, None)
+        else:
+            yield old[0], old[1:], new[1:]
+            old, new = next(old_sentences, None), next(new_sentences, None)
+
+
+def sentence_status(entry, with_statuses):
+    # a sentence missing in records without status records has no errors, in records with them it was not analyzed
+    if entry is None:
+        return (MISSING, None) if with_statuses else (ANALYZED, Counter())
+    status, errors = entry
+    return status or ANALYZED, errors
+
+
+def diff_errors(old_records, new_records, n=20):
+    introduced = Counter()  # (category, label) -> number of new errors
+    fixed = Counter()
+    most_regressed = []  # heaps of (change, sentence id, introduced, fixed) with the n largest changes
+    most_improved = []
+    not_analyzed = []  # (sentence id, old status, new status) of sentences skipped or missing in a run
+    num_sentences = 0
+    num_changed = 0
+    old_with_statuses = new_with_statuses = False
+    for sentence_id, old, new in align_sentences(sentence_errors(old_records), sentence_errors(new_records)):
+        # status records are written for every sentence, so the first sentence of a file shows whether it has them
+        old_with_statuses = old_with_statuses or bool(old and old[0])
+        new_with_statuses = new_with_statuses or bool(new and new[0])
+        old_status, old_errors = sentence_status(old, old_with_statuses)
+        new_status, new_errors = sentence_status(new, new_with_statuses)
+        if old_status != ANALYZED or new_status != ANALYZED:
+            not_analyzed.append((sentence_id, old_status, new_status))
+            continue
+        num_sentences += 1
+        if old_errors == new_errors:
+            continue
+        num_changed += 1
+        new_only = new_errors - old_errors
+        old_only = old_errors - new_errors
+        for (category, label, _), freq in new_only.items():
+            introduced[(category, label)] += freq
+        for (category, label, _), freq in old_only.items():
+            fixed[(category, label)] += freq
+        num_introduced, num_fixed = sum(new_only.values()), sum(old_only.values())
+        change = num_introduced - num_fixed
+        heap, item = (most_regressed, (change, -sentence_id, num_introduced, num_fixed)) if change > 0 else \
+            (most_improved, (-change, -sentence_id, num_introduced, num_fixed))
+        if change and len(heap) < n:
+            heapq.heappush(heap, item)
+        elif change:
+            heapq.heappushpop(heap, item)
+    most_regressed = [(-i, c, a, f) for c, i, a, f in sorted(most_regressed, reverse=True)]
+    most_improved = [(-i, -c, a, f) for c, i, a, f in sorted(most_improved, reverse=True)]
+    return introduced, fixed, most_regressed, most_improved, not_analyzed, num_sentences, num_changed
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Per sentence differences between the errors of two runs')
+    parser.add_argument('old', help="Error records of the old run (cateval.py --records or parse_analyzer.py output, "
+                                    "which lists only sentences with errors)")
+    parser.add_argument('new', help="Error records of the new run")
+    parser.add_argument('-n', type=int, default=20, help="Number of most regressed/improved sentences to show")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    old_file, new_file = ropen_file(args.old), ropen_file(args.new)
+    introduced, fixed, most_regressed, most_improved, not_analyzed, num_sentences, num_changed = diff_errors(
+        read_records(old_file), read_records(new_file), args.n)
+    old_file.close()
+    new_file.close()
+
+    print(f"Compared sentences: {num_sentences}, changed: {num_changed}, not analyzed in a run: {len(not_analyzed)}")
+    print(f"Introduced errors: {sum(introduced.values())}, fixed errors: {sum(fixed.values())}")
+    print()
+    print("Category\tLabel\tIntroduced\tFixed\tChange")
+    for category, label in sorted(set(introduced) | set(fixed),
+                                  key=lambda key: (introduced[key] - fixed[key], introduced[key]), reverse=True):
+        key = (category, label)
+        print(f"{category}\t{label}\t{introduced[key]}\t{fixed[key]}\t{introduced[key] - fixed[key]:+d}")
+    print()
+    print("Most regressed sentences (id, change, introduced, fixed):")
+    for sentence_id, change, num_introduced, num_fixed in most_regressed:
+        print("{:>5}\t{:+d}\t{}\t{}".format(sentence_id, change, num_introduced, num_fixed))
+    print()
+    print("Most improved sentences (id, change, introduced, fixed):")
+    for sentence_id, change, num_introduced, num_fixed in most_improved:
+        print("{:>5}\t{:+d}\t{}\t{}".format(sentence_id, change, num_introduced, num_fixed))
+    print()
+    print("Sentences not analyzed in a run (id, old status, new status):")
+    for sentence_id, old_status, new_status in not_analyzed[:args.n]:
+        print("{:>5}\t{}\t{}".format(sentence_id, old_status, new_status))
+    if len(not_analyzed) > args.n:
+        print(f"... {len(not_analyzed) - args.n} more: " + ', '.join(
+            f"{old} -> {new}: {freq}" for (old, new), freq in Counter(t[1:] for t in not_analyzed).most_common()))
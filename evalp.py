@@ -1,5 +1,8 @@
+import argparse
+
+from labels import DEFAULT_LABELS, parameter_labels
 from node import Node, Terminal
-from utils import open_gold_eval_files
+from utils import parse_sentence_range, ropen_file
 
 
 class EvalStat(object):
@@ -88,12 +91,13 @@ def parseBrackets(brackets):
     return parent_node
 
 
-def compare_parses(gold, eval, labeled=False):
-    gold_spans = gold.spans()
-    eval_spans = eval.spans()
+def compare_parses(gold, eval, labeled=False, labels=DEFAULT_LABELS):
+    word_positions = labels.word_positions(tuple(gold.pos_tags())) if labels.delete_labels else None
+    gold_spans = labels.normalize_spans(gold.spans(), word_positions)
+    eval_spans = labels.normalize_spans(eval.spans(), word_positions)
 
     if labeled:
-        matched_spans = len(set(gold_spans).intersection(set(eval_spans)))
+        matched_spans = len(set(span[:3] for span in gold_spans).intersection(set(span[:3] for span in eval_spans)))
     else:
         gold_bracketed_spans = set((span[0], span[1]) for span in gold_spans)
         matched_spans = 0
@@ -105,16 +109,20 @@ def compare_parses(gold, eval, labeled=False):
     return len(gold_spans), len(eval_spans), matched_spans
 
 
-def label_accuracy(gold_pos, eval_pos):
-    total_tags = len(eval_pos)
+def label_accuracy(gold_pos, eval_pos, labels=DEFAULT_LABELS):
+    total_tags = 0
     correct_tags = 0
     for gold, eval in zip(gold_pos, eval_pos):
-        if gold == eval:
+        gold, _, deleted = labels[gold]
+        if deleted:
+            continue
+        total_tags += 1
+        if gold == labels[eval][0]:
             correct_tags += 1
     return correct_tags, total_tags
 
 
-def evalp(gold_file, eval_file, labeled=False):
+def evalp(gold_file, eval_file, labeled=False, sentence_range=None, labels=DEFAULT_LABELS):
     num_sentences = 0
     num_error_sentences = 0
     num_skipped_sentences = 0
@@ -124,11 +132,15 @@ def evalp(gold_file, eval_file, labeled=False):
     print(total_eval.header())
 
     for gold_brackets in gold_file:
+        if sentence_range and num_sentences == sentence_range[1]:
+            break
         num_sentences += 1
         gold_brackets = gold_brackets.strip()
         if not gold_brackets:
             continue
         test_brackets = next(eval_file).strip()
+        if sentence_range and num_sentences < sentence_range[0]:
+            continue
         if not test_brackets:
             num_error_sentences += 1
             continue
@@ -149,8 +161,8 @@ def evalp(gold_file, eval_file, labeled=False):
             num_skipped_sentences += 1
             continue
 
-        num_gold_spans, num_test_spans, num_matching_spans = compare_parses(gold, eval, labeled)
-        num_matching_tags, num_all_tags = label_accuracy(tuple(gold.pos_tags()), tuple(eval.pos_tags()))
+        num_gold_spans, num_test_spans, num_matching_spans = compare_parses(gold, eval, labeled, labels)
+        num_matching_tags, num_all_tags = label_accuracy(tuple(gold.pos_tags()), tuple(eval.pos_tags()), labels)
         row = EvalStat(num_gold_spans, num_test_spans, num_matching_spans, num_matching_tags, num_all_tags)
         print(row.row_str(num_sentences))
         total_eval += row
@@ -220,14 +232,31 @@ def find_mismatched_brackets(gold, eval):
     return mismatched_spans
 
 
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gold", help="gold brackets file")
+    parser.add_argument("proposed", help="generated brackets file")
+    parser.add_argument('--shard', help="Evaluate only a part of the corpus: i/N or a line range first:last")
+    parser.add_argument('--balanced-shards', action='store_true',
+                        help="Split i/N shards into parts of equal size in bytes instead of equal number of lines")
+    parser.add_argument('--save', '-s', help="Save the (partial) result to a file, see merge.py")
+    parser.add_argument('--params', '-p', help="EVALB-style parameter file with label rules, see labels.py")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    gold_file, eval_file = open_gold_eval_files()
+    args = parse_arguments()
+    sentence_range = parse_sentence_range(args.shard, args.gold, args.balanced_shards) if args.shard else None
+    labels = parameter_labels(args.params)
+    gold_file, eval_file = ropen_file(args.gold), ropen_file(args.proposed)
 
     total_eval, num_error_sentences, num_skipped_sentences, num_sentences = evalp(
         gold_file,
         eval_file,
-        labeled=False)
+        labeled=False, sentence_range=sentence_range, labels=labels)
 
+    first_sentence, last_sentence = sentence_range[0] if sentence_range else 1, num_sentences
+    num_sentences = max(0, last_sentence - first_sentence + 1)
     print("Number of analyzed sentences: {}".format(num_sentences))
     print("Error sentences: {}".format(num_error_sentences))
     print("Skipped sentences: {}".format(num_skipped_sentences))
@@ -235,3 +264,10 @@ if __name__ == "__main__":
 
     gold_file.close()
     eval_file.close()
+
+    if args.save:
+        from partial import PartialResult, save_partial
+
+        save_partial(PartialResult(first_sentence, last_sentence, stat=total_eval,
+                                   num_error_sentences=num_error_sentences,
+                                   num_skipped_sentences=num_skipped_sentences), args.save)
@@ -0,0 +1,110 @@
+import gzip
+import pickle
+from bisect import bisect_left
+
+from evalp import parseBrackets
+from node import Node
+
+WORD = 'word'
+POS = 'pos'
+CAT = 'cat'
+
+
+class InvertedIndex(object):
+    # maps words (lower case), POS tags and nonterminal labels to postings (sentence_id, start, end, parent label);
+    # the parent of a word is its POS tag, the parent of the root node is None
+
+    def __init__(self):
+        self.postings = {WORD: {}, POS: {}, CAT: {}}
+        self.sorted_keys = {}
+        self.num_sentences = 0
+
+    def add_tree(self, sentence_id, tree):
+        for node in tree.nonterminals():
+            parent_label = node.parent.label if node.parent else None
+            if any(isinstance(child, Node) for child in node.children):
+                self.postings[CAT].setdefault(node.label, []).append((sentence_id, node.start, node.end,
+                                                                      parent_label))
+            else:
+                self.postings[POS].setdefault(node.label, []).append((sentence_id, node.start, node.end,
+                                                                      parent_label))
+                for leaf in node.leaves():
+                    self.postings[WORD].setdefault(leaf.label.lower(), []).append((sentence_id, node.start,
+                                                                                   node.end, node.label))
+        self.sorted_keys.clear()
+
+    def keys(self, kind, prefix=''):
+        # keys of the given kind starting with prefix, like the startswith() matches in Node and evalp
+        if kind not in self.sorted_keys:
+            self.sorted_keys[kind] = sorted(self.postings[kind])
+        keys = self.sorted_keys[kind]
+        result = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            result.append(keys[i])
+        return result
+
+    def lookup(self, kind, key, prefix=False):
+        if kind == WORD:
+            key = key.lower()
+        if not prefix:
+            return self.postings[kind].get(key, [])
+        result = []
+        for k in self.keys(kind, key):
+            result.extend(self.postings[kind][k])
+        result.sort()
+        return result
+
+    def sentences(self, kind, key, prefix=False):
+        return set(posting[0] for posting in self.lookup(kind, key, prefix))
+
+
+def intersect_spans(*posting_lists):
+    # (sentence_id, start, end) spans that occur in all posting lists, e.g. a word with a given POS tag
+    result = None
+    for postings in posting_lists:
+        spans = set(posting[:3] for posting in postings)
+        result = spans if result is None else result & spans
+    return sorted(result) if result else []
+
+
+def intersect_sentences(*posting_lists):
+    result = None
+    for postings in posting_lists:
+        sentences = set(posting[0] for posting in postings)
+        result = sentences if result is None else result & sentences
+    return sorted(result) if result else []
+
+
+def join_errors(postings, error_records):
+    # pairs of postings and error records (see parse_analyzer.read_error_records) of the same sentence,
+    # where the posting lies within the span of the error
+    by_sentence = {}
+    for posting in postings:
+        by_sentence.setdefault(posting[0], []).append(posting)
+    for record in error_records:
+        sentence_id, _, span, _ = record
+        for posting in by_sentence.get(sentence_id, ()):
+            if span[0] <= posting[1] and posting[2] <= span[1]:
+                yield posting, record
+
+
+def build_index(gold_file):
+    index = InvertedIndex()
+    for sentence_id, brackets in enumerate(gold_file, 1):
+        brackets = brackets.strip()
+        if brackets:
+            index.add_tree(sentence_id, parseBrackets(brackets))
+        index.num_sentences = sentence_id
+    return index
+
+
+def save_index(index, path):
+    with gzip.open(path, 'wb') as f:
+        pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_index(path):
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,104 @@
+import re
+import sys
+
+# EVALB parameters that are accepted in parameter files, but have no effect here
+# (EQ_WORD is not supported: sentences with differing words are skipped, as without a parameter file)
+IGNORED_PARAMETERS = ('DEBUG', 'MAX_ERROR', 'CUTOFF_LEN', 'LABELED', 'DELETE_LABEL_FOR_LENGTH', 'EQ_WORD')
+
+
+def core_label(s: str) -> str:
+    if '-' in s:
+        return s.split('-')[0]
+    elif '=' in s:
+        return s.split('=')[0]
+    return s
+
+
+class LabelTable(dict):
+    # label normalization rules compiled into a lookup table: label -> (normalized label, core label, deleted);
+    # an entry is computed on the first lookup of a label, so the hot loops need a single dict lookup per label
+
+    def __init__(self, delete_labels=(), equivalences=None, strip_features=None):
+        super().__init__()
+        self.delete_labels = frozenset(delete_labels)
+        self.equivalences = dict(equivalences or {})  # label -> representative of its equivalence class
+        self.strip_features = strip_features and re.compile(strip_features)
+
+    def __missing__(self, label):
+        normalized = self.equivalences.get(label, label)
+        core = self.strip_features.sub('', normalized) if self.strip_features else core_label(normalized)
+        entry = (normalized, self.equivalences.get(core, core), label in self.delete_labels)
+        self[label] = entry
+        return entry
+
+    def word_positions(self, gold_pos):
+        # like EVALB, words with a deleted POS tag (punctuation) are removed: the (original) positions of the
+        # remaining words, None for removed words; None if no word is removed
+        if not self.delete_labels or self.delete_labels.isdisjoint(gold_pos):
+            return None
+        return [None if tag in self.delete_labels else i for i, tag in enumerate(gold_pos)]
+
+    def normalize_spans(self, spans, word_positions=None):
+        # (start, end, label, core label) of spans without deleted labels; with word_positions spans are reduced to
+        # their first and last remaining word, so spans differing only in removed words are equal, but keep the
+        # positions of the sentence; spans of removed words only are dropped
+        result = []
+        for start, end, label in spans:
+            normalized, core, deleted = self[label]
+            if deleted:
+                continue
+            if word_positions is not None:
+                inner = [p for p in word_positions[start:end + 1] if p is not None]
+                if not inner:
+                    continue
+                start, end = inner[0], inner[-1]
+            result.append((start, end, normalized, core))
+        return result
+
+
+DEFAULT_LABELS = LabelTable()
+
+
+def read_parameter_file(path):
+    # EVALB-style parameter file, one parameter per line, lines starting with # are comments:
+    #   DELETE_LABEL <label>          brackets with the label are not evaluated, for POS tags (punctuation)
+    #                                 the words are removed as well
+    #   EQ_LABEL <label> <label> ...  equivalent labels, all of them are replaced by the first one
+    #   STRIP_FEATURES <regex>        removed from labels to get the core label (default: from the first - or =)
+    delete_labels = []
+    equivalences = {}
+    strip_features = None
+    with open(path, 'rt') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, _, value = line.partition(' ')
+            value = value.strip()
+            if not value and key in ('DELETE_LABEL', 'EQ_LABEL', 'STRIP_FEATURES'):
+                raise ValueError(f"{path}:{line_number}: missing value of {key}")
+            if key == 'DELETE_LABEL':
+                delete_labels.append(value)
+            elif key == 'EQ_LABEL':
+                labels = value.split()
+                for label in labels[1:]:
+                    equivalences[label] = labels[0]
+            elif key == 'STRIP_FEATURES':
+                try:
+                    re.compile(value)
+                except re.error as e:
+                    raise ValueError(f"{path}:{line_number}: invalid regular expression {value}: {e}")
+                strip_features = value
+            elif key not in IGNORED_PARAMETERS:
+                raise ValueError(f"{path}:{line_number}: unknown parameter {key}")
+    return LabelTable(delete_labels, equivalences, strip_features)
+
+
+def parameter_labels(path):
+    # label table of the parameter file for the command line tools, exits with a message if it can not be read
+    if not path:
+        return DEFAULT_LABELS
+    try:
+        return read_parameter_file(path)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Invalid parameter file: {e}")
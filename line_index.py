@@ -0,0 +1,100 @@
+import os
+import pickle
+from array import array
+from bisect import bisect_left
+
+from utils import rbopen_file
+
+INDEX_SUFFIX = '.lidx'
+
+
+class LineIndex(object):
+    # byte offsets of the lines of a (possibly gzipped) bracket file, line numbers are 1-based like sentence ids;
+    # offsets of gzipped files refer to the uncompressed data
+
+    def __init__(self, path, offsets, empty_lines, size, mtime):
+        self.path = path
+        self.offsets = offsets  # start of every line and the end of the file
+        self.empty_lines = empty_lines  # sorted numbers of empty lines, they have no counterpart in eval files
+        self.size = size
+        self.mtime = mtime
+
+    def num_lines(self):
+        return len(self.offsets) - 1
+
+    def is_fresh(self):
+        stat = os.stat(self.path)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def is_empty(self, line_number):
+        i = bisect_left(self.empty_lines, line_number)
+        return i < len(self.empty_lines) and self.empty_lines[i] == line_number
+
+    def eval_line_number(self, sentence_id):
+        # line of the eval file with the parse of the gold sentence (see the alignment in parse_analyzer.analyze)
+        return sentence_id - bisect_left(self.empty_lines, sentence_id)
+
+    def chunks(self, num_chunks):
+        # (first, last) line ranges with (approximately) the same number of bytes
+        ranges = []
+        first = 1
+        for i in range(1, num_chunks + 1):
+            last = bisect_left(self.offsets, self.offsets[-1] * i // num_chunks) if i < num_chunks \
+                else self.num_lines()
+            last = max(first - 1, min(last, self.num_lines()))
+            ranges.append((first, last))
+            first = last + 1
+        return ranges
+
+
+def build_line_index(path):
+    offsets = array('q', [0])
+    empty_lines = array('l')
+    with rbopen_file(path) as f:
+        for line_number, line in enumerate(f, 1):
+            offsets.append(offsets[-1] + len(line))
+            if not line.strip():
+                empty_lines.append(line_number)
+    stat = os.stat(path)
+    return LineIndex(path, offsets, empty_lines, stat.st_size, stat.st_mtime)
+
+
+def save_line_index(index, index_path):
+    with open(index_path, 'wb') as f:
+        pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_line_index(index_path):
+    with open(index_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def line_index(path, save=True):
+    # the index stored next to the file, (re)built if it is missing or outdated; if it can not be saved (e.g. in a
+    # read-only directory), the index is only kept in memory
+    index_path = path + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        index = load_line_index(index_path)
+        index.path = path  # the stored path may be relative to another directory or of a copied corpus
+        if index.is_fresh():
+            return index
+    index = build_line_index(path)
+    if save:
+        try:
+            save_line_index(index, index_path)
+        except OSError:
+            pass
+    return index
+
+
+def read_lines(index, line_numbers):
+    # {line number: line} of the requested lines; lines are read in file order, so that gzipped files, which can
+    # only be read forward, are decompressed in a single pass
+    result = {}
+    with rbopen_file(index.path) as f:
+        for line_number in sorted(set(line_numbers)):
+            if not 1 <= line_number <= index.num_lines():
+                continue
+            f.seek(index.offsets[line_number - 1])
+            result[line_number] = f.readline().decode('utf-8').strip()
+    return result
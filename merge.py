@@ -0,0 +1,35 @@
+import argparse
+import sys
+
+from partial import PartialResult, load_partial, merge, range_problems, save_partial
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Merge partial results of sharded evaluation runs')
+    parser.add_argument('partials', nargs='+', help="Partial result files written with --shard ... --save")
+    parser.add_argument('--save', '-s', help="Save the merged result (can be merged again or loaded by cateval.py)")
+    parser.add_argument('--most-common', '-n', type=int, default=100, help="Number of most common errors to print")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    partials = [load_partial(path) for path in args.partials]
+    if any(not isinstance(p, PartialResult) for p in partials):
+        sys.exit('Not a partial result file, please create it with --shard and --save')
+    problems = range_problems(partials)
+    if problems:
+        sys.exit('\n'.join(problems))
+    total = merge(partials)
+
+    if total.analysis is not None:
+        total.analysis.print_most_common(args.most_common)
+        print()
+    if total.stat is not None:
+        print("Number of analyzed sentences: {}".format(total.num_sentences()))
+        print("Error sentences: {}".format(total.num_error_sentences))
+        print("Skipped sentences: {}".format(total.num_skipped_sentences))
+        print(total.stat.bottom_str())
+
+    if args.save:
+        save_partial(total, args.save)
@@ -1,3 +1,4 @@
+import os
 from collections import OrderedDict
 
 
@@ -35,6 +36,7 @@ class Node:
         self.end = end_index
         self.parent = None
         self.keep = False
+        self.subtree_hash = None
 
     def add_child(self, child):
         self.children.append(child)
@@ -43,6 +45,13 @@ class Node:
     def add_leaf(self, leaf):
         self.children.append(leaf)
 
+    def structure_hash(self):
+        # Merkle-style hash of the subtree (labels and words), computed once on demand
+        if self.subtree_hash is None:
+            self.subtree_hash = hash((self.label, tuple([child.structure_hash() if child.__class__ is Node else
+                                                         child.label for child in self.children])))
+        return self.subtree_hash
+
     def neat_str(self, level=0):
         result = '(' + self.label
         spacing = '\t' * (level + 1)
@@ -129,6 +138,18 @@ class Node:
             return []
         return spans
 
+    def unary_spans(self):
+        # spans() restricted to this node and the chain of its unary descendants with the same span
+        spans = []
+        node = self
+        while any(isinstance(child, Node) for child in node.children):
+            spans.append((node.start, node.end, node.label))
+            child = node.children[0]
+            if len(node.children) > 1 or child.start != node.start or child.end != node.end:
+                break
+            node = child
+        return spans
+
     def find_by_POS(self, pos):
         labels = []
         for child in self.children:
@@ -1,10 +1,17 @@
 import os
+import time
+from ast import literal_eval
 from collections import Counter
+from itertools import count
 
 from evalp import parseBrackets
-from utils import open_gold_eval_files
+from labels import DEFAULT_LABELS, core_label
+from node import Node
+from utils import LineFollower, open_gold_eval_files
 
 ERROR_CATEGORIES = ("PART_TAG_MISMATCH", "TAG_MISMATCH", "PART_WRONG_LABEL_SPAN", "WRONG_LABEL_SPAN", "WRONG_SPAN")
+# status of a sentence in a records file: analyzed, skipped (the words do not match) or without an eval parse
+SENTENCE_STATUSES = ("OK", "SKIPPED", "EMPTY")
 
 
 class FailureAnalyzer:
@@ -62,21 +69,17 @@ class FailureAnalyzer:
 
         return result
 
-    def print_most_common(self, n):
-        print(f"{ERROR_CATEGORIES[0]}")
-        print(Counter(t[1] for t in self.part_mismatched_tag_spans).most_common(n))
-
-        print(f"{ERROR_CATEGORIES[1]}")
-        print(Counter(t[1] for t in self.mismatched_tag_spans).most_common(n))
-
-        print(f"{ERROR_CATEGORIES[2]}")
-        print(Counter(t[1] for t in self.part_wrong_label_spans).most_common(n))
+    def error_counters(self) -> tuple:
+        return (Counter(t[1] for t in self.part_mismatched_tag_spans),
+                Counter(t[1] for t in self.mismatched_tag_spans),
+                Counter(t[1] for t in self.part_wrong_label_spans),
+                Counter(t[1] for t in self.wrong_label_spans),
+                Counter(t[1] for t in self.failed_spans))
 
-        print(f"{ERROR_CATEGORIES[3]}")
-        print(Counter(t[1] for t in self.wrong_label_spans).most_common(n))
-
-        print(f"{ERROR_CATEGORIES[4]}")
-        print(Counter(t[1] for t in self.failed_spans).most_common(n))
+    def print_most_common(self, n):
+        for category, counter in zip(ERROR_CATEGORIES, self.error_counters()):
+            print(f"{category}")
+            print(counter.most_common(n))
 
     def print_by_tags(self, tags, n):
         print_proposed_alternatives(ERROR_CATEGORIES[0], self.part_mismatched_tag_spans,
@@ -104,6 +107,36 @@ class FailureAnalyzer:
                                self.proposal + o.proposal,
                                self.node_counter + o.node_counter)
 
+    def __iadd__(self, o):
+        self.mismatched_tag_spans.extend(o.mismatched_tag_spans)
+        self.part_mismatched_tag_spans.extend(o.part_mismatched_tag_spans)
+        self.failed_spans.extend(o.failed_spans)
+        self.wrong_label_spans.extend(o.wrong_label_spans)
+        self.part_wrong_label_spans.extend(o.part_wrong_label_spans)
+        self.proposal += o.proposal
+        self.node_counter.update(o.node_counter)
+        return self
+
+
+def status_record(sentence_id, status):
+    return "{:>5}\t{}".format(sentence_id, status) + os.linesep
+
+
+def read_records(lines):
+    # parses error records in the format of FailureAnalyzer.__str__ as (sentence id, category, span, label) and
+    # status records (see status_record) as (sentence id, status, None, None), other lines are ignored
+    for line in lines:
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) == 2 and fields[1] in SENTENCE_STATUSES:
+            yield int(fields[0]), fields[1], None, None
+        elif len(fields) == 3 and fields[1] in ERROR_CATEGORIES:
+            span, label = literal_eval(fields[2])
+            yield int(fields[0].split()[0]), fields[1], span, label
+
+
+def read_error_records(lines):
+    return (record for record in read_records(lines) if record[1] in ERROR_CATEGORIES)
+
 
 def print_proposed_alternatives(label, error_type, proposed, tags, n):
     c = Counter(t[1] for t in error_type)
@@ -136,41 +169,39 @@ class Proposal(object):
                         merge_counter_dicts(self.proposed_wrong_label_spans, o.proposed_wrong_label_spans),
                         merge_counter_dicts(self.proposed_part_wrong_label_spans, o.proposed_part_wrong_label_spans))
 
+    def __iadd__(self, o):
+        update_counter_dict(self.proposed_mismatched_tag_spans, o.proposed_mismatched_tag_spans)
+        update_counter_dict(self.proposed_part_mismatched_tag_spans, o.proposed_part_mismatched_tag_spans)
+        update_counter_dict(self.proposed_wrong_label_spans, o.proposed_wrong_label_spans)
+        update_counter_dict(self.proposed_part_wrong_label_spans, o.proposed_part_wrong_label_spans)
+        return self
+
 
 def merge_counter_dicts(my_dict, other_dict) -> dict:
-    result = my_dict.copy()
-    for k, v in other_dict.items():
-        if k in my_dict:
-            result[k].update(v)
-        else:
-            result[k] = v
+    # counters are copied, so that neither operand is modified
+    result = dict((k, v.copy()) for k, v in my_dict.items())
+    update_counter_dict(result, other_dict)
     return result
 
 
-def core_label(s: str) -> str:
-    if '-' in s:
-        return s.split('-')[0]
-    elif '=' in s:
-        return s.split('=')[0]
-    return s
-
-
-# def core_label(s: str) -> str:
-#     if '=' in s:
-#         s = s.split('=')[0]
-#     if '-' in s:
-#         s = s.split('-')[0]
-#     return s
+def update_counter_dict(my_dict, other_dict):
+    # in-place variant of merge_counter_dicts, does not share counters with other_dict
+    for k, v in other_dict.items():
+        my_dict.setdefault(k, Counter()).update(v)
 
 
-def unmatched_tags(gold_pos, test_pos):
+def unmatched_tags(gold_pos, test_pos, positions=None, labels=DEFAULT_LABELS):
     part_mismatched_tag_spans = []
     mismatched_tag_spans = []
     proposed_part_mismatched_tag_spans = {}
     proposed_mismatched_tag_spans = {}
-    for i, (gold, test) in enumerate(zip(gold_pos, test_pos)):
+    for i, gold, test in zip(positions if positions is not None else count(), gold_pos, test_pos):
+        gold, gold_core, deleted = labels[gold]
+        if deleted:
+            continue
+        test, test_core, _ = labels[test]
         if gold != test:
-            if core_label(gold) == core_label(test):
+            if gold_core == test_core:
                 part_mismatched_tag_spans.append(((i, i), gold))
                 counter = proposed_part_mismatched_tag_spans.setdefault(gold, Counter())
                 counter.update({test: 1})
@@ -183,18 +214,56 @@ def unmatched_tags(gold_pos, test_pos):
 
 def span_into_map(spans) -> dict:
     result = dict()
-    for (start, end, label) in spans:
+    for (start, end, label, core) in spans:
         span = (start, end)
         if span in result:
-            result[span].append(label)
+            result[span].append((label, core))
         else:
-            result[span] = [label, ]
+            result[span] = [(label, core), ]
     return result
 
 
-def analyze_parses(gold, test):
-    gold_span_map = span_into_map(gold.spans())
-    test_span_map = span_into_map(test.spans())
+def add_pos_tags(node, tags):
+    tags.update(zip(range(node.start, node.end + 1), node.pos_tags()))
+
+
+def differing_spans_and_tags(gold, test, gold_spans, test_spans, gold_tags, test_tags):
+    # spans (in the order of spans()) and POS tags (by position) of both trees, except for the inside of identical
+    # subtrees at the same position, which can not contain errors
+    if gold.structure_hash() == test.structure_hash():
+        gold_spans.extend(gold.unary_spans())
+        test_spans.extend(test.unary_spans())
+        return
+    gold_children = [child for child in gold.children if isinstance(child, Node)]
+    test_children = [child for child in test.children if isinstance(child, Node)]
+    if not gold_children or not test_children:
+        gold_spans.extend(gold.spans())
+        test_spans.extend(test.spans())
+        add_pos_tags(gold, gold_tags)
+        add_pos_tags(test, test_tags)
+        return
+    gold_spans.append((gold.start, gold.end, gold.label))
+    test_spans.append((test.start, test.end, test.label))
+    test_children_map = dict(((child.start, child.end), child) for child in test_children)
+    for gold_child in gold_children:
+        test_child = test_children_map.pop((gold_child.start, gold_child.end), None)
+        if test_child is None:
+            gold_spans.extend(gold_child.spans())
+            add_pos_tags(gold_child, gold_tags)
+        else:
+            differing_spans_and_tags(gold_child, test_child, gold_spans, test_spans, gold_tags, test_tags)
+    for test_child in test_children_map.values():
+        test_spans.extend(test_child.spans())
+        add_pos_tags(test_child, test_tags)
+
+
+def analyze_parses(gold, test, labels=DEFAULT_LABELS, word_positions=None):
+    return analyze_spans(gold.spans(), test.spans(), labels, word_positions)
+
+
+def analyze_spans(gold_spans, test_spans, labels=DEFAULT_LABELS, word_positions=None):
+    gold_span_map = span_into_map(labels.normalize_spans(gold_spans, word_positions))
+    test_span_map = span_into_map(labels.normalize_spans(test_spans, word_positions))
     proposed_wrong_label_spans = {}
     proposed_part_wrong_label_spans = {}
 
@@ -204,19 +273,22 @@ def analyze_parses(gold, test):
     for item in gold_span_map.items():
         span, gold_labels = item
         if span not in test_span_map:  # this gold span doesn't exist
-            for label in gold_labels:
+            for label, _ in gold_labels:
                 failed_spans.append((span, label))
         else:  # span exists, check labels
-            test_labels = set(test_span_map[span])
-            part_test_labels = set(core_label(x) for x in test_labels)
-            for label in gold_labels:
+            test_entries = test_span_map[span]
+            test_labels = set(label for label, _ in test_entries)
+            part_test_labels = set(core for _, core in test_entries)
+            for label, core in gold_labels:
                 if label in test_labels:
                     continue  # a perfect match of the span and gold and test labels
-                if core_label(label) in part_test_labels:
+                if core in part_test_labels:
                     part_wrong_label_spans.append((span, label))
                     proposed_labels = set()
-                    for proposed_label in test_labels:
-                        if label.startswith(core_label(proposed_label)):
+                    for proposed_label, proposed_core in test_entries:
+                        # same core label as the classification (formerly a prefix test, which for gold NX also
+                        # proposed a test label N)
+                        if proposed_core == core:
                             proposed_labels.add(proposed_label)
                     proposed_part_wrong_label_spans.setdefault(label, Counter()).update(proposed_labels)
                 else:  # span is correct, but all test labels are wrong
@@ -225,16 +297,18 @@ def analyze_parses(gold, test):
     return failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans, proposed_part_wrong_label_spans
 
 
-def layered_node_into_map(layered_nodes):
+def layered_node_into_map(layered_nodes, labels=DEFAULT_LABELS):
     result = {}
     for node, depth in layered_nodes.items():
-        result[(node.start, node.end, depth)] = node.label
+        label, core, deleted = labels[node.label]
+        if not deleted:
+            result[(node.start, node.end, depth)] = (label, core)
     return result
 
 
-def analyze_layered_parses(gold, test):
-    gold_span_map = layered_node_into_map(gold.layered_spans())
-    test_span_map = layered_node_into_map(test.layered_spans())
+def analyze_layered_parses(gold, test, labels=DEFAULT_LABELS):
+    gold_span_map = layered_node_into_map(gold.layered_spans(), labels)
+    test_span_map = layered_node_into_map(test.layered_spans(), labels)
 
     proposed_wrong_label_spans = {}
     proposed_part_wrong_label_spans = {}
@@ -242,14 +316,14 @@ def analyze_layered_parses(gold, test):
     failed_spans = []
     wrong_label_spans = []
     part_wrong_label_spans = []
-    for span, label in gold_span_map.items():
+    for span, (label, core) in gold_span_map.items():
         if span not in test_span_map:  # this gold span doesn't exist
             failed_spans.append((span, label))
         else:  # span exists, check labels
-            test_label = test_span_map[span]
+            test_label, test_core = test_span_map[span]
             if label == test_label:
                 continue  # a perfect match of the span and gold and test labels
-            if core_label(label) == core_label(test_label):
+            if core == test_core:
                 part_wrong_label_spans.append((span, label))
                 proposed_part_wrong_label_spans.setdefault(label, Counter()).update({test_label: 1})
             else:  # span is correct, but all test labels are wrong
@@ -258,65 +332,160 @@ def analyze_layered_parses(gold, test):
     return failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans, proposed_part_wrong_label_spans
 
 
-def analyze(gold_file, eval_file, layered=False):
+def analyze_sentence(gold_brackets, test_brackets, sentence_id, layered=False, labels=DEFAULT_LABELS):
+    gold = parseBrackets(gold_brackets)
+    if test_brackets == gold_brackets:  # exact match, no need to parse and compare
+        return analyze_trees(gold, gold, sentence_id, layered, labels)
+    return analyze_trees(gold, parseBrackets(test_brackets), sentence_id, layered, labels)
+
+
+def analyze_trees(gold, eval, sentence_id, layered=False, labels=DEFAULT_LABELS):
+    # root labels (e.g. VROOT) and punctuation can be excluded from evaluation with DELETE_LABEL, see labels.py
+    if eval.end != gold.end:
+        print(f"{sentence_id}: Mismatch of number of words in\ngold:{gold}\ntest:{eval}")
+        return None
+
+    identical = gold is eval or gold.structure_hash() == eval.structure_hash()
+    if not identical:
+        eval_set = set(str(t) for t in eval.leaves())
+        gold_set = set(str(t) for t in gold.leaves())
+        if eval_set != gold_set:
+            new_eval_words = eval_set - gold_set
+            new_gold_words = gold_set - eval_set
+            print(f"{sentence_id}: Words unmatch {new_gold_words} | {new_eval_words}")
+            return None
+    sentence_len = gold.end - gold.start + 1
+    node_counter = Counter(entry[0] for entry in (labels[nt.label] for nt in gold.nonterminals()) if not entry[2])
+    # node_counter = Counter(core_label(nt.label) for nt in gold.nonterminals())
+    if identical:  # nothing to compare
+        return FailureAnalyzer([], [], [], [], [], Proposal({}, {}, {}, {}), node_counter, sentence_id, 1,
+                               sentence_len)
+    word_positions = labels.word_positions(tuple(gold.pos_tags())) if labels.delete_labels else None
+    if layered:
+        mismatched_tag_spans, proposed_mismatched_tag_spans, part_mismatched_tag_spans, proposed_part_mismatched_tag_spans = unmatched_tags(
+            gold.pos_tags(),
+            eval.pos_tags(), labels=labels)
+        [failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans,
+         proposed_part_wrong_label_spans] = analyze_layered_parses(gold, eval, labels)
+    elif word_positions is not None:
+        # spans are reduced to the remaining words, identical subtrees can not be skipped
+        mismatched_tag_spans, proposed_mismatched_tag_spans, part_mismatched_tag_spans, proposed_part_mismatched_tag_spans = unmatched_tags(
+            gold.pos_tags(),
+            eval.pos_tags(), word_positions, labels)
+        [failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans,
+         proposed_part_wrong_label_spans] = analyze_parses(gold, eval, labels, word_positions)
+    else:
+        gold_spans, test_spans, gold_tags, test_tags = [], [], {}, {}
+        differing_spans_and_tags(gold, eval, gold_spans, test_spans, gold_tags, test_tags)
+        positions = sorted(gold_tags)
+        mismatched_tag_spans, proposed_mismatched_tag_spans, part_mismatched_tag_spans, proposed_part_mismatched_tag_spans = unmatched_tags(
+            (gold_tags[i] for i in positions),
+            (test_tags.get(i) for i in positions), positions, labels)
+        [failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans,
+         proposed_part_wrong_label_spans] = analyze_spans(gold_spans, test_spans, labels)
+
+    prop = Proposal(proposed_mismatched_tag_spans, proposed_part_mismatched_tag_spans, proposed_wrong_label_spans,
+                    proposed_part_wrong_label_spans)
+    return FailureAnalyzer(mismatched_tag_spans, part_mismatched_tag_spans, failed_spans, wrong_label_spans,
+                           part_wrong_label_spans, prop, node_counter, sentence_id, 1, sentence_len)
+
+
+def analyze(gold_file, eval_file, layered=False, sentence_range=None, labels=DEFAULT_LABELS, records_file=None):
+    # the error records of every sentence are printed to stdout; with records_file they are written to the file,
+    # preceded by a status record of every sentence, so that sentences without errors can be told from skipped ones
     num_sentences = 0
     num_error_sentences = 0
     num_skipped_sentences = 0
 
     total_eval = FailureAnalyzer.init_default()
-    total_node_counter = Counter()
     # print(total_eval.header())
 
     for gold_brackets in gold_file:
+        if sentence_range and num_sentences == sentence_range[1]:
+            break
         num_sentences += 1
         gold_brackets = gold_brackets.strip()
         if not gold_brackets:
             continue
         test_brackets = next(eval_file).strip()
+        if sentence_range and num_sentences < sentence_range[0]:
+            continue
         if not test_brackets:
             num_error_sentences += 1
+            if records_file:
+                records_file.write(status_record(num_sentences, SENTENCE_STATUSES[2]))
             continue
-        gold = parseBrackets(gold_brackets)
-        eval = parseBrackets(test_brackets)
-
-        if eval.end != gold.end:
-            print(f"{num_sentences}: Mismatch of number of words in\ngold:{gold}\ntest:{eval}")
-            num_error_sentences += 1
+        row = analyze_sentence(gold_brackets, test_brackets, num_sentences, layered, labels)
+        if row is None:
+            num_skipped_sentences += 1
+            if records_file:
+                records_file.write(status_record(num_sentences, SENTENCE_STATUSES[1]))
             continue
 
-        # # strip TOP_LABEL (VROOT) in both gold and eval treees
-        # if gold.label == TOP_LABEL and len(gold.children) == 1:
-        #     gold = gold.children[0]
-        # if eval.label == TOP_LABEL and len(eval.children) == 1:
-        #     eval = eval.children[0]
+        if records_file:
+            records_file.write(status_record(num_sentences, SENTENCE_STATUSES[0]))
+            records_file.write(str(row))
+        else:
+            print(row)
+        total_eval += row
+
+    return total_eval
 
-        eval_set = set(str(t) for t in eval.leaves())
-        gold_set = set(str(t) for t in gold.leaves())
-        if eval_set != gold_set:
-            new_eval_words = eval_set - gold_set
-            new_gold_words = gold_set - eval_set
-            print(f"{num_sentences}: Words unmatch {new_gold_words} | {new_eval_words}")
-            num_skipped_sentences += 1
-            continue
-        sentence_len = gold.end - gold.start + 1
-        node_counter = Counter(nt.label for nt in gold.nonterminals())
-        # node_counter = Counter(core_label(nt.label) for nt in gold.nonterminals())
-        total_node_counter.update(node_counter)
-        mismatched_tag_spans, proposed_mismatched_tag_spans, part_mismatched_tag_spans, proposed_part_mismatched_tag_spans = unmatched_tags(
-            gold.pos_tags(),
-            eval.pos_tags())
 
-        [failed_spans, wrong_label_spans, proposed_wrong_label_spans, part_wrong_label_spans,
-         proposed_part_wrong_label_spans] = analyze_layered_parses(gold, eval) if layered else analyze_parses(gold,
-                                                                                                              eval)
+def print_follow_summary(counters, previous_counters, num_sentences, new_sentences, elapsed, n):
+    print(f"Sentences: {num_sentences} (+{new_sentences}, {new_sentences / elapsed:.1f} sent/s)")
+    for category, counter, previous in zip(ERROR_CATEGORIES, counters, previous_counters):
+        delta = counter - previous
+        print(f"{category}: {sum(counter.values())} (+{sum(delta.values())})")
+        print(delta.most_common(n))
+    print()
 
-        prop = Proposal(proposed_mismatched_tag_spans, proposed_part_mismatched_tag_spans, proposed_wrong_label_spans,
-                        proposed_part_wrong_label_spans)
-        row = FailureAnalyzer(mismatched_tag_spans, part_mismatched_tag_spans, failed_spans, wrong_label_spans,
-                              part_wrong_label_spans, prop, node_counter, num_sentences, 1, sentence_len)
 
-        print(row)
-        total_eval += row
+def analyze_follow(gold_file, eval_file, layered=False, interval=10.0, poll_interval=0.5, n=10,
+                   labels=DEFAULT_LABELS):
+    # tails both files (like tail -f) and analyzes every complete new line, until interrupted with Ctrl+C
+    num_sentences = 0
+    reported_sentences = 0
+    total_eval = FailureAnalyzer.init_default()
+    counters = total_eval.error_counters()
+    previous_counters = total_eval.error_counters()
+
+    gold_lines = LineFollower(gold_file)
+    eval_lines = LineFollower(eval_file)
+    gold_brackets = None
+    last_report = time.monotonic()
+    try:
+        while True:
+            if gold_brackets is None:
+                gold_brackets = gold_lines.readline()
+            if gold_brackets is not None and not gold_brackets.strip():
+                # empty gold lines have no counterpart in the eval file, no eval line may be consumed for them
+                num_sentences += 1
+                gold_brackets = None
+                continue
+            test_brackets = eval_lines.readline() if gold_brackets is not None else None
+            if test_brackets is None:
+                time.sleep(poll_interval)
+            else:
+                num_sentences += 1
+                gold_brackets, test_brackets = gold_brackets.strip(), test_brackets.strip()
+                if test_brackets:
+                    row = analyze_sentence(gold_brackets, test_brackets, num_sentences, layered, labels)
+                    if row is not None:
+                        total_eval += row
+                        for counter, row_counter in zip(counters, row.error_counters()):
+                            counter.update(row_counter)
+                gold_brackets = None
+
+            now = time.monotonic()
+            if now - last_report >= interval and num_sentences > reported_sentences:
+                print_follow_summary(counters, previous_counters, num_sentences, num_sentences - reported_sentences,
+                                     now - last_report, n)
+                previous_counters = tuple(counter.copy() for counter in counters)
+                reported_sentences = num_sentences
+                last_report = now
+    except KeyboardInterrupt:
+        pass
 
     return total_eval
 
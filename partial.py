@@ -0,0 +1,126 @@
+import gzip
+import pickle
+
+
+class PartialResult(object):
+    # result of evaluating the gold lines first_sentence..last_sentence (1-based, inclusive)
+
+    def __init__(self, first_sentence, last_sentence, analysis=None, stat=None, num_error_sentences=0,
+                 num_skipped_sentences=0):
+        self.first_sentence = first_sentence
+        self.last_sentence = last_sentence
+        self.analysis = analysis
+        self.stat = stat
+        self.num_error_sentences = num_error_sentences
+        self.num_skipped_sentences = num_skipped_sentences
+
+    def num_sentences(self):
+        # results can only be added if their ranges are adjacent, so a result covers its whole range
+        return max(0, self.last_sentence - self.first_sentence + 1)
+
+    def __getstate__(self):
+        # the stat is pickled as plain counts: evalp.py run as a script creates instances of __main__.EvalStat,
+        # which could not be unpickled by other programs
+        state = dict(self.__dict__)
+        if self.stat is not None:
+            state['stat'] = dict(vars(self.stat))
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if isinstance(self.stat, dict):
+            from evalp import EvalStat
+            self.stat = EvalStat(**self.stat)
+
+    def range_str(self):
+        return f"{self.first_sentence}:{self.last_sentence}"
+
+    def __add__(self, o):
+        # errors are concatenated in corpus order, so merging shards reproduces the output of a single run
+        first, second = (self, o) if self.first_sentence <= o.first_sentence else (o, self)
+        if second.first_sentence != first.last_sentence + 1:
+            raise ValueError(f"Sentence ranges {first.range_str()} and {second.range_str()} are not adjacent")
+        return PartialResult(first.first_sentence,
+                             second.last_sentence,
+                             add_optional(first.analysis, second.analysis),
+                             add_optional(first.stat, second.stat),
+                             first.num_error_sentences + second.num_error_sentences,
+                             first.num_skipped_sentences + second.num_skipped_sentences)
+
+
+def add_optional(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def save_partial(partial, path):
+    with gzip.open(path, 'wb') as f:
+        pickle.dump(partial, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_partial(path):
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_analysis(path):
+    # accepts both a plain pickled FailureAnalyzer (cateval.py --save) and a partial result file (merge.py)
+    with open(path, 'rb') as f:
+        if f.read(2) == b'\x1f\x8b':
+            return load_partial(path).analysis
+        f.seek(0)
+        return pickle.load(f)
+
+
+def split_kinds(partials):
+    # partial results of cateval.py carry an analysis, those of evalp.py a stat (and the numbers of error and
+    # skipped sentences); both kinds can be merged at once, each of them is merged separately
+    analyses = [PartialResult(p.first_sentence, p.last_sentence, analysis=p.analysis)
+                for p in partials if p.analysis is not None]
+    stats = [PartialResult(p.first_sentence, p.last_sentence, stat=p.stat, num_error_sentences=p.num_error_sentences,
+                           num_skipped_sentences=p.num_skipped_sentences)
+             for p in partials if p.stat is not None]
+    return [(name, kind) for name, kind in (('analysis', analyses), ('stat', stats)) if kind]
+
+
+def range_problems(partials):
+    # descriptions of gaps and overlaps between the sentence ranges of the partial results of each kind
+    problems = []
+    covered = []
+    for name, kind in split_kinds(partials):
+        kind = sorted(kind, key=lambda p: (p.first_sentence, p.last_sentence))
+        for first, second in zip(kind, kind[1:]):
+            if second.first_sentence > first.last_sentence + 1:
+                problems.append(f"Missing sentences {first.last_sentence + 1}:{second.first_sentence - 1} "
+                                f"between {name} results {first.range_str()} and {second.range_str()}")
+            elif second.first_sentence <= first.last_sentence:
+                problems.append(f"Overlapping sentences {second.first_sentence}:"
+                                f"{min(first.last_sentence, second.last_sentence)} "
+                                f"in {name} results {first.range_str()} and {second.range_str()}")
+        covered.append((name, kind[0].first_sentence, max(p.last_sentence for p in kind)))
+    if len(covered) == 2 and covered[0][1:] != covered[1][1:]:
+        problems.append("Analysis and stat results cover different sentences: {}:{} and {}:{}".format(
+            *covered[0][1:], *covered[1][1:]))
+    return problems
+
+
+def merge(partials):
+    # raises ValueError if the sentence ranges have gaps or overlaps, see range_problems
+    totals = []
+    for _, kind in split_kinds(partials):
+        kind = sorted(kind, key=lambda p: p.first_sentence)
+        total = kind[0]
+        for partial in kind[1:]:
+            total += partial
+        totals.append(total)
+    if len(totals) == 1:
+        return totals[0]
+    analysis, stat = totals
+    if (analysis.first_sentence, analysis.last_sentence) != (stat.first_sentence, stat.last_sentence):
+        raise ValueError(f"Analysis and stat results cover different sentences: {analysis.range_str()} and "
+                         f"{stat.range_str()}")
+    stat.analysis = analysis.analysis
+    return stat
@@ -0,0 +1,170 @@
+import argparse
+import io
+import math
+import random
+from collections import Counter
+from contextlib import redirect_stdout
+from statistics import NormalDist
+
+from evalp import EvalStat, compare_parses, label_accuracy, parseBrackets
+from labels import DEFAULT_LABELS, parameter_labels
+from parse_analyzer import analyze_trees
+from line_index import line_index, read_lines
+
+
+def index_gold_sentences(gold_index):
+    # (sentence id, byte offset, length) of non-empty gold lines, the i-th of them corresponds to the i-th eval line
+    offsets = gold_index.offsets
+    return [(sentence_id, offsets[sentence_id - 1], offsets[sentence_id] - offsets[sentence_id - 1])
+            for sentence_id in range(1, gold_index.num_lines() + 1) if not gold_index.is_empty(sentence_id)]
+
+
+def sample_order(sentences, stratified=False, rng=random, num_strata=10):
+    order = list(range(len(sentences)))
+    if not stratified:
+        rng.shuffle(order)
+        return order
+    # strata of (approximately) equal size by line length, sampled round robin => proportional allocation
+    order.sort(key=lambda i: sentences[i][2])
+    size = math.ceil(len(order) / num_strata)
+    strata = [order[i:i + size] for i in range(0, len(order), size)]
+    for stratum in strata:
+        rng.shuffle(stratum)
+    return [stratum[i] for i in range(size) for stratum in strata if i < len(stratum)]
+
+
+def sampled_lines(gold_index, eval_index, sentences, order, batch_size):
+    # (sentence id, gold brackets, eval brackets) in sampled order; the lines of each batch are read in file order
+    # (see line_index.read_lines), so a gzipped file is decompressed once per batch instead of once per sentence
+    for i in range(0, len(order), batch_size):
+        batch = order[i:i + batch_size]
+        gold_lines = read_lines(gold_index, [sentences[index][0] for index in batch])
+        eval_lines = read_lines(eval_index, [index + 1 for index in batch])  # i-th gold sentence, i-th eval line
+        for index in batch:
+            sentence_id = sentences[index][0]
+            yield sentence_id, gold_lines[sentence_id], eval_lines.get(index + 1, '')
+
+
+def ratio_estimate(numerators, denominators, sampling_fraction, z):
+    # ratio estimator sum(numerators) / sum(denominators) with its confidence half-width (normal approximation)
+    n = len(numerators)
+    total = sum(denominators)
+    if not total:
+        return 0.0, math.inf
+    ratio = sum(numerators) / total
+    if n < 2:
+        return ratio, math.inf
+    residual_var = sum((a - ratio * b) ** 2 for a, b in zip(numerators, denominators)) / (n - 1)
+    fpc = max(0.0, 1 - sampling_fraction)
+    return ratio, z * math.sqrt(fpc * residual_var / n) / (total / n)
+
+
+def label_estimates(labels, error_rows, node_rows, sampling_fraction, z):
+    result = []
+    for label in labels:
+        rate, margin = ratio_estimate([c[label] for c in error_rows], [c[label] for c in node_rows],
+                                      sampling_fraction, z)
+        result.append((label, rate, margin))
+    return result
+
+
+def sample_evaluate(gold_path, eval_path, confidence=0.95, f1_margin=0.5, rate_margin=2.0, top=5,
+                    stratified=False, seed=None, min_sentences=100, check_every=100, max_sentences=None,
+                    layered=False, labels=DEFAULT_LABELS):
+    # margins are given in percentage points
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    gold_index = line_index(gold_path)
+    eval_index = line_index(eval_path)
+    sentences = index_gold_sentences(gold_index)
+    population = len(sentences)
+    order = sample_order(sentences, stratified, random.Random(seed))
+    if max_sentences:
+        order = order[:max_sentences]
+
+    stat = EvalStat()
+    total_errors = Counter()
+    matched_spans, mean_spans, error_rows, node_rows = [], [], [], []
+    num_processed = 0
+    num_skipped = 0
+
+    def estimate():
+        sampling_fraction = num_processed / max(1, population)
+        return (*ratio_estimate(matched_spans, mean_spans, sampling_fraction, z),
+                label_estimates([label for label, _ in total_errors.most_common(top)], error_rows, node_rows,
+                                sampling_fraction, z))
+
+    for sentence_id, gold_brackets, test_brackets in sampled_lines(gold_index, eval_index, sentences, order,
+                                                                   check_every):
+        num_processed += 1
+        gold = parseBrackets(gold_brackets)
+        eval = parseBrackets(test_brackets) if test_brackets else None
+        with redirect_stdout(io.StringIO()):  # mismatching words are counted as skipped sentences
+            row = analyze_trees(gold, eval, sentence_id, layered, labels) if eval is not None else None
+        if row is None:
+            num_skipped += 1
+        else:
+            num_gold_spans, num_test_spans, num_matching_spans = compare_parses(gold, eval, labels=labels)
+            num_matching_tags, num_all_tags = label_accuracy(tuple(gold.pos_tags()), tuple(eval.pos_tags()),
+                                                             labels)
+            stat += EvalStat(num_gold_spans, num_test_spans, num_matching_spans, num_matching_tags, num_all_tags)
+
+            matched_spans.append(num_matching_spans)
+            mean_spans.append((num_gold_spans + num_test_spans) / 2)  # F1 = 2 * matched / (gold + test)
+            error_counter = Counter(t[1] for t in row.all_errors())
+            total_errors.update(error_counter)
+            error_rows.append(error_counter)
+            node_rows.append(row.node_counter)
+
+        # checked after skipped sentences as well, so that no check is missed
+        if num_processed % check_every == 0:
+            f1, f1_half_width, rates = estimate()
+            if (num_processed >= min_sentences and f1_half_width * 100 <= f1_margin
+                    and all(margin * 100 <= rate_margin for _, _, margin in rates)):
+                break
+    else:
+        f1, f1_half_width, rates = estimate()
+
+    return f1, f1_half_width, rates, stat, num_processed, num_skipped, population
+
+
+def bounds_str(estimate, half_width):
+    return "{:.2f}\t[{:.2f}, {:.2f}]".format(estimate * 100, max(0.0, estimate - half_width) * 100,
+                                            min(1.0, estimate + half_width) * 100)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Estimate evaluation results from a random sample of sentences')
+    parser.add_argument("gold", help="gold brackets file")
+    parser.add_argument("proposed", help="generated brackets file")
+    parser.add_argument('--confidence', type=float, default=0.95, help="Confidence level (default: 0.95)")
+    parser.add_argument('--f1-margin', type=float, default=0.5,
+                        help="Stop when the F-score is known within +- this many points (default: 0.5)")
+    parser.add_argument('--rate-margin', type=float, default=2.0,
+                        help="Stop when the error rates of the top labels are known within +- this many points "
+                             "(default: 2.0)")
+    parser.add_argument('--top', type=int, default=5, help="Number of most frequent error labels to estimate")
+    parser.add_argument('--stratified', action='store_true', help="Stratify the sample by sentence length")
+    parser.add_argument('--seed', type=int, help="Random seed")
+    parser.add_argument('--min-sentences', type=int, default=100, help="Minimal number of sampled sentences")
+    parser.add_argument('--check-every', type=int, default=100, help="Check the stopping criterion every n sentences")
+    parser.add_argument('--max-sentences', type=int, help="Maximal number of sampled sentences")
+    parser.add_argument('--params', '-p', help="EVALB-style parameter file with label rules, see labels.py")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    f1, f1_half_width, rates, stat, num_processed, num_skipped, population = sample_evaluate(
+        args.gold, args.proposed, args.confidence, args.f1_margin, args.rate_margin, args.top, args.stratified,
+        args.seed, args.min_sentences, args.check_every, args.max_sentences, labels=parameter_labels(args.params))
+
+    print(f"Sampled sentences: {num_processed} of {population} (skipped: {num_skipped})")
+    print(f"Confidence: {args.confidence * 100:g}%")
+    print("F-score:\t" + bounds_str(f1, f1_half_width))
+    print("Error rates of the most frequent error labels:")
+    for label, rate, margin in rates:
+        print(f"{label}:\t" + bounds_str(rate, margin))
+    if stat.num_gold_spans and stat.num_test_spans:
+        print()
+        print("Totals of the sampled sentences:")
+        print(stat.bottom_str(), end='')
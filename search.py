@@ -0,0 +1,61 @@
+import argparse
+import sys
+
+from inverted_index import CAT, POS, WORD, build_index, intersect_sentences, intersect_spans, join_errors, \
+    load_index, save_index
+from parse_analyzer import read_error_records
+from utils import ropen_file
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Inverted index of words, POS tags and categories of a treebank')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build the index of a gold file")
+    build.add_argument('gold', help="gold brackets file")
+    build.add_argument('index', help="index file to write")
+    query = subparsers.add_parser('query', help="Look up words, POS tags and categories, all given ones must match")
+    query.add_argument('index', help="index file")
+    query.add_argument('--word', '-w', help="Word (case insensitive)")
+    query.add_argument('--pos', '-p', help="POS tag")
+    query.add_argument('--cat', '-c', help="Nonterminal category")
+    query.add_argument('--prefix', action='store_true', help="Match POS tags and categories by prefix")
+    query.add_argument('--errors', '-e', help="Join with error records written by parse_analyzer.py")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.command == 'build':
+        gold_file = ropen_file(args.gold)
+        save_index(build_index(gold_file), args.index)
+        gold_file.close()
+    else:
+        index = load_index(args.index)
+        posting_lists = []
+        if args.word:
+            posting_lists.append(index.lookup(WORD, args.word))
+        if args.pos:
+            posting_lists.append(index.lookup(POS, args.pos, args.prefix))
+        if args.cat:
+            posting_lists.append(index.lookup(CAT, args.cat, args.prefix))
+        if not posting_lists:
+            sys.exit('Please specify at least one of --word, --pos and --cat')
+
+        if args.word and args.pos:
+            # word and POS tag describe the same position, categories only the same sentence
+            spans = set(intersect_spans(*posting_lists[:2]))
+            postings = [p for p in posting_lists[1] if p[:3] in spans]
+        else:
+            postings = posting_lists[0]
+        sentences = set(intersect_sentences(postings, *posting_lists[1:]))
+        postings = [p for p in postings if p[0] in sentences]
+
+        if args.errors:
+            with ropen_file(args.errors) as f:
+                for posting, (sentence_id, category, span, label) in join_errors(postings, read_error_records(f)):
+                    print("{:>5}\t{}\t{}\t{}\t{}\t{}".format(sentence_id, posting[1:3], posting[3], category, span,
+                                                            label))
+        else:
+            for sentence_id, start, end, parent_label in postings:
+                print("{:>5}\t{}\t{}".format(sentence_id, (start, end), parent_label))
+            print(f"{len(postings)} matches in {len(sentences)} sentences")
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import io
+import json
+import time
+from contextlib import redirect_stdout
+
+from evalp import EvalStat, compare_parses, label_accuracy, parseBrackets
+from labels import DEFAULT_LABELS, parameter_labels
+from parse_analyzer import analyze_trees
+from utils import dumper, ropen_file
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class EvaluationService(object):
+    # keeps the parsed gold treebank and the label table in memory and evaluates eval brackets of single sentences
+
+    def __init__(self, gold_trees, labels=DEFAULT_LABELS):
+        self.gold_trees = gold_trees
+        self.labels = labels
+        self.num_requests = 0
+        self.num_sentences = 0
+
+    def analyze_sentence(self, sentence_id, test_brackets, layered=False):
+        gold = self.gold_trees.get(sentence_id)
+        if gold is None:
+            return {'id': sentence_id, 'error': "unknown sentence id"}
+        try:
+            eval = parseBrackets(test_brackets)
+        except (AssertionError, AttributeError, IndexError):
+            eval = None
+        if eval is None:
+            return {'id': sentence_id, 'error': "malformed brackets"}
+        with redirect_stdout(io.StringIO()):  # no diagnostics on the server output, the sentence gets an error
+            row = analyze_trees(gold, eval, sentence_id, layered, self.labels)
+        if row is None:
+            return {'id': sentence_id, 'error': "words do not match the gold sentence"}
+        num_gold_spans, num_test_spans, num_matching_spans = compare_parses(gold, eval, labels=self.labels)
+        num_matching_tags, num_all_tags = label_accuracy(tuple(gold.pos_tags()), tuple(eval.pos_tags()),
+                                                         self.labels)
+        stat = EvalStat(num_gold_spans, num_test_spans, num_matching_spans, num_matching_tags, num_all_tags)
+        return {'id': sentence_id, 'analysis': row, 'stat': stat}
+
+    def analyze_batch(self, request):
+        # request: {"sentences": [{"id": <sentence id>, "eval": <brackets>}, ...], "layered": false}
+        start = time.perf_counter()
+        if not isinstance(request, dict) or not isinstance(request.get('sentences'), list):
+            raise ValueError("expected an object with a list of sentences")
+        if not all(isinstance(sentence, dict) for sentence in request['sentences']):
+            raise ValueError("expected sentences as objects with id and eval")
+        layered = bool(request.get('layered', False))
+        results = [self.analyze_sentence(int(sentence['id']), sentence['eval'], layered)
+                   for sentence in request['sentences']]
+        total = EvalStat()
+        for result in results:
+            if 'stat' in result:
+                total += result['stat']
+        self.num_requests += 1
+        self.num_sentences += len(results)
+        return {'results': results, 'total': total, 'milliseconds': (time.perf_counter() - start) * 1000}
+
+    def status(self):
+        return {'gold_sentences': len(self.gold_trees), 'requests': self.num_requests,
+                'analyzed_sentences': self.num_sentences}
+
+    def dispatch(self, method, path, body):
+        if path == '/status':
+            return (200, self.status()) if method == 'GET' else (405, {'error': "use GET"})
+        if path != '/analyze':
+            return 404, {'error': f"unknown path {path}, use POST /analyze or GET /status"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+        try:
+            return 200, self.analyze_batch(json.loads(body))
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f"invalid request: {e!r}"}
+        except Exception as e:  # e.g. RecursionError for very deep trees, the server keeps running
+            return 500, {'error': f"analysis failed: {e!r}"}
+
+
+def load_gold_trees(gold_file):
+    trees = {}
+    for sentence_id, brackets in enumerate(gold_file, 1):
+        brackets = brackets.strip()
+        if brackets:
+            trees[sentence_id] = parseBrackets(brackets)
+    return trees
+
+
+async def handle_connection(service, reader, writer):
+    # minimal HTTP/1.1 with keep-alive, requests are answered in order
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, version = request_line.decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            status, payload = service.dispatch(method, path, body)
+            data = json.dumps(payload, default=dumper).encode('utf-8')
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            writer.write((f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                          f"Content-Type: application/json\r\n"
+                          f"Content-Length: {len(data)}\r\n"
+                          f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8765, socket_path=None):
+    def handler(reader, writer):
+        return handle_connection(service, reader, writer)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    print(f"Serving {len(service.gold_trees)} gold sentences on {socket_path or f'http://{host}:{port}'}")
+    async with server:
+        await server.serve_forever()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Local evaluation server keeping the gold treebank in memory. '
+                                                 'POST /analyze {"sentences": [{"id": 1, "eval": "(S ...)"}]}')
+    parser.add_argument("gold", help="gold brackets file")
+    parser.add_argument('--host', default='127.0.0.1', help="Host to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument('--socket', help="Listen on a Unix socket instead of a TCP port")
+    parser.add_argument('--params', '-p', help="EVALB-style parameter file with label rules, see labels.py")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    gold_file = ropen_file(args.gold)
+    service = EvaluationService(load_gold_trees(gold_file),
+                                parameter_labels(args.params))
+    gold_file.close()
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,44 @@
+import argparse
+
+from evalp import parseBrackets
+from line_index import line_index, read_lines
+from parse_analyzer import analyze_sentence
+
+
+def fetch_sentences(gold_path, eval_path, sentence_ids):
+    # [(sentence id, gold brackets, eval brackets)], brackets are None for empty or missing lines
+    gold_index = line_index(gold_path)
+    gold_lines = read_lines(gold_index, sentence_ids)
+    eval_lines = {}
+    if eval_path:
+        eval_line_numbers = dict((sentence_id, gold_index.eval_line_number(sentence_id)) for sentence_id in sentence_ids
+                                 if not gold_index.is_empty(sentence_id))
+        eval_by_line = read_lines(line_index(eval_path), eval_line_numbers.values())
+        eval_lines = dict((sentence_id, eval_by_line.get(line_number))
+                          for sentence_id, line_number in eval_line_numbers.items())
+    return [(sentence_id, gold_lines.get(sentence_id) or None, eval_lines.get(sentence_id) or None)
+            for sentence_id in sentence_ids]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Show gold and eval trees of sentences by their ids, using line '
+                                                 'indexes stored next to the files (*.lidx)')
+    parser.add_argument("gold", help="gold brackets file")
+    parser.add_argument("ids", nargs='+', type=int, help="sentence ids (line numbers of the gold file)")
+    parser.add_argument('--eval', '-e', help="generated brackets file")
+    parser.add_argument('--errors', action='store_true', help="Show the errors of the eval trees")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    for sentence_id, gold_brackets, eval_brackets in fetch_sentences(args.gold, args.eval, args.ids):
+        print(f"Sentence {sentence_id}")
+        print("gold:")
+        print(parseBrackets(gold_brackets).neat_str() if gold_brackets else '-')
+        if args.eval:
+            print("eval:")
+            print(parseBrackets(eval_brackets).neat_str() if eval_brackets else '-')
+            if args.errors and gold_brackets and eval_brackets:
+                print(analyze_sentence(gold_brackets, eval_brackets, sentence_id) or '', end='')
+        print()
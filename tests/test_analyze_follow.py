@@ -0,0 +1,42 @@
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_analyzer import analyze, analyze_follow  # noqa: E402
+
+GOLD = """(S (A (P this)) (B (Q is) (A (R a) (T test))))
+
+(S (A (P this)) (B (Q is) (A (R a) (T test))))
+
+
+(S (A (P that)) (B (Q was) (C (R a) (T test))))
+(S (A (P this)) (B (Q is) (A (R a) (T test))))
+"""
+
+EVAL = """(S (A (P this)) (B (Q is) (A (R a) (T test))))
+(S (A (P this)) (B (Q is) (C (R a) (T test))))
+(S (B (P that)) (B (Q was) (C (R a) (T test))))
+(S (A (P this)) (C (Q is) (A (R a) (D test))))
+"""
+
+
+class AnalyzeFollowTest(unittest.TestCase):
+
+    def test_empty_gold_lines(self):
+        # follow mode stops (like Ctrl+C) when it has to wait for new lines
+        with redirect_stdout(io.StringIO()), mock.patch('parse_analyzer.time.sleep', side_effect=KeyboardInterrupt):
+            followed = analyze_follow(io.StringIO(GOLD), io.StringIO(EVAL), interval=1e9)
+            expected = analyze(io.StringIO(GOLD), io.StringIO(EVAL))
+        self.assertEqual(followed.node_counter, expected.node_counter)
+        self.assertEqual(sum(followed.node_counter.values()), 32)
+        self.assertEqual(followed.error_counters(), expected.error_counters())
+        self.assertEqual(list(followed.all_errors()), list(expected.all_errors()))
+
+
+if __name__ == '__main__':
+    unittest.main()
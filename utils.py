@@ -1,5 +1,6 @@
 import argparse
 import gzip
+import sys
 
 
 def ropen_file(path):
@@ -9,6 +10,20 @@ def ropen_file(path):
         return open(path, 'rt')
 
 
+def wopen_file(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt')
+    else:
+        return open(path, 'wt')
+
+
+def rbopen_file(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    else:
+        return open(path, 'rb')
+
+
 def open_gold_eval_files():
     parser = argparse.ArgumentParser(description='Take node ids from file and replace')
     parser.add_argument("gold", help="gold brackets file")
@@ -17,8 +32,52 @@ def open_gold_eval_files():
 
     return ropen_file(args.gold), ropen_file(args.proposed)
 
+def count_lines(path):
+    with ropen_file(path) as f:
+        return sum(1 for _ in f)
+
+
+def parse_sentence_range(spec, gold_path, balanced=False):
+    # 'i/N' is the i-th of N contiguous shards of the gold file with the same number of lines (with balanced of
+    # about the same size in bytes, see line_index.py; all shards of a run have to use the same setting),
+    # 'first:last' an inclusive range of line numbers
+    try:
+        if '/' in spec:
+            shard, num_shards = (int(x) for x in spec.split('/'))
+            if not 1 <= shard <= num_shards:
+                raise ValueError
+            if balanced:
+                from line_index import line_index
+                return line_index(gold_path).chunks(num_shards)[shard - 1]
+            num_lines = count_lines(gold_path)
+            return (shard - 1) * num_lines // num_shards + 1, shard * num_lines // num_shards
+        first, last = (int(x) for x in spec.split(':'))
+        if not 1 <= first <= last:
+            raise ValueError
+        return first, last
+    except ValueError:
+        sys.exit(f"Invalid shard '{spec}', expected i/N (1 <= i <= N) or first:last")
+
+
 def dumper(obj):
     try:
         return obj.toJSON()
     except:
-        return obj.__dict__
\ No newline at end of file
+        return obj.__dict__
+
+class LineFollower:
+    # non-blocking reader of a growing file: returns only complete lines, None if there is no new complete line yet
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+
+    def readline(self):
+        line = self.file.readline()
+        if not line:
+            return None
+        self.buffer += line
+        if not self.buffer.endswith('\n'):
+            return None
+        line, self.buffer = self.buffer, ''
+        return line